@@ -1,10 +1,15 @@
 import streamlit as st
 import requests
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
 import io
-import json
+import orjson
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils import preprocess_data
 
 # --- Configuration ---
 SEARCH_WEBHOOK_URL = "http://localhost:5678/webhook/ai-business-lookup"
@@ -13,31 +18,125 @@ EMAIL_WEBHOOK_URL = "http://localhost:5678/webhook/email_writting"
 EMAIL_SEND_WEBHOOK_URL = "http://localhost:5678/webhook/email_management"
 REQUEST_TIMEOUT = 300 # Seconds (5 minutes)
 UPDATE_TIMEOUT = 300 # Seconds for single update/send request
+MAX_WORKERS = 16 # Concurrent requests for batch update/send
+BATCH_SIZE = 100 # Records per POST for batch update/send
+CACHE_MAX_ROWS = 50_000 # st.cache_data only hashes a 10k-row sample of frames this large
+
+# Webhook URL and timeout per action
+ENDPOINTS = {
+    "search": (SEARCH_WEBHOOK_URL, REQUEST_TIMEOUT),
+    "update": (UPDATE_WEBHOOK_URL, UPDATE_TIMEOUT),
+    "write": (EMAIL_WEBHOOK_URL, UPDATE_TIMEOUT),
+    "send": (EMAIL_SEND_WEBHOOK_URL, UPDATE_TIMEOUT),
+}
+
+# Shared HTTP session so webhook requests reuse pooled keep-alive connections
+SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=Retry(total=3, backoff_factor=0.2))
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
+JSON_HEADERS = {"Content-Type": "application/json"}
 
 # --- Shared Utility Functions (Code omitted for brevity, but they remain unchanged) ---
 
-def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
+def _post(action: str, data: bytes) -> requests.Response:
+    """Sends a pre-serialized JSON body to the webhook configured for the action."""
+    url, timeout = ENDPOINTS[action]
+    return SESSION.post(url, data=data, headers=JSON_HEADERS, timeout=timeout)
+
+def _records_to_df(records: list) -> pd.DataFrame:
     """
-    Converts necessary columns (like 'timestamp') to their correct data types 
-    for compatibility with st.data_editor and fills None values.
+    Builds a DataFrame column-wise from a list of webhook records and applies
+    preprocess_data, avoiding pandas' per-row dict inference. Lists that are
+    not all dicts fall back to plain pd.DataFrame construction.
     """
-    if 'timestamp' in df.columns and df['timestamp'].dtype == object:
-        try:
-            df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce', utc=True)
-        except Exception as e:
-            st.warning(f"Could not convert 'timestamp' column to datetime. Error: {e}")
-    
-    if 'emails' in df.columns:
-        df['emails'] = df['emails'].astype(str).replace('None', '') 
+    if all(isinstance(r, dict) for r in records):
+        keys = dict.fromkeys(k for r in records for k in r)
+        cols = {k: [r.get(k) for r in records] for k in keys}
+        df = pd.DataFrame(cols, copy=False)
+    else:
+        df = pd.DataFrame(records)
+    return _to_arrow_backed(preprocess_data(df))
+
+def _to_arrow_backed(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts string columns that aren't already Arrow-backed (pure-string object
+    columns and Python-backed 'string' columns such as 'emails') to
+    pyarrow-backed strings so st.data_editor can ship the frame to the browser
+    cheaply. Mixed-type object columns are left alone so payload types don't change.
+    """
+    str_cols = []
+    for c in df.columns:
+        dtype = df[c].dtype
+        if isinstance(dtype, pd.StringDtype):
+            if dtype.storage != 'pyarrow':
+                str_cols.append(c)
+        elif dtype == object and pd.api.types.infer_dtype(df[c], skipna=True) == 'string':
+            str_cols.append(c)
+    return df.astype({c: 'string[pyarrow]' for c in str_cols}) if str_cols else df
+
+def _records_chunk(cols: dict, start: int, stop: int) -> list:
+    """
+    Builds the record dicts for rows [start, stop) from per-column arrays, so
+    payload dicts only exist for the chunk being serialized.
+    """
+    return [{c: values[i] for c, values in cols.items()} for i in range(start, stop)]
+
+def _json_default(obj):
+    """orjson fallback for pandas missing-value scalars (e.g. from new editor rows)."""
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def _dumps_records(payload: dict) -> bytes:
+    """Serializes a batch payload built from numpy column values."""
+    return orjson.dumps(payload, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+@st.cache_data(show_spinner=False)
+def _parse_and_preprocess(payload_bytes: bytes):
+    """
+    Parses a raw JSON array payload into a preprocessed DataFrame.
+    Returns None if the payload is not a non-empty list; raises
+    orjson.JSONDecodeError on invalid JSON. Cached on the payload bytes so
+    identical responses/pastes skip the parse and conversions.
+    """
+    data = orjson.loads(payload_bytes)
+    if data and isinstance(data, list):
+        return _records_to_df(data)
+    return None
+
+def _encode_df(df: pd.DataFrame, fmt: str) -> bytes:
+    """
+    Returns the CSV or JSON download bytes for the DataFrame. Tables below
+    CACHE_MAX_ROWS go through the cache; larger ones are always re-serialized,
+    since an edit outside Streamlit's hash sample would return stale bytes.
+    """
+    if len(df) >= CACHE_MAX_ROWS:
+        return _serialize_df(df, fmt)
+    return _serialize_df_cached(df, fmt)
 
-    return df
+@st.cache_data(show_spinner=False, max_entries=8)
+def _serialize_df_cached(df: pd.DataFrame, fmt: str) -> bytes:
+    """Cached _serialize_df, so reruns with an unchanged table skip the work."""
+    return _serialize_df(df, fmt)
+
+def _serialize_df(df: pd.DataFrame, fmt: str) -> bytes:
+    """
+    Serializes the DataFrame to CSV or JSON bytes for the download buttons.
+    """
+    if fmt == 'csv':
+        return df.to_csv(index=False).encode('utf-8')
+
+    json_buffer = io.StringIO()
+    df.to_json(json_buffer, orient='records', date_format='iso', indent=4)
+    return json_buffer.getvalue().encode('utf-8')
 
 def generate_payload(search_query: str) -> dict:
     """Generates the JSON payload for the POST request."""
     return {
         "searchQuery": search_query,
-        "requestId": f"req-{uuid.uuid4()}",
-        "timestamp": datetime.utcnow().isoformat(timespec='seconds') + 'Z'
+        "requestId": "req-" + uuid.uuid4().hex,
+        "timestamp": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
     }
 
 def make_search_request(search_query: str):
@@ -49,25 +148,19 @@ def make_search_request(search_query: str):
     st.info(f"Sending POST request to webhook: {SEARCH_WEBHOOK_URL} with query: **{search_query}** (Timeout set to {REQUEST_TIMEOUT} seconds)")
     
     try:
-        response = requests.post(
-            SEARCH_WEBHOOK_URL,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=REQUEST_TIMEOUT 
-        )
+        response = _post("search", orjson.dumps(payload))
         
         if response.status_code == 200:
             try:
-                data = json.loads(response.text)
-            except json.JSONDecodeError:
+                df = _parse_and_preprocess(response.content)
+            except orjson.JSONDecodeError:
                 st.error("Error: Could not decode JSON from webhook response.")
                 st.code(response.text, language='text')
                 return None
                 
-            if data and isinstance(data, list):
+            if df is not None:
                 st.success("Search successful! Data received.")
-                df = pd.DataFrame(data)
-                return preprocess_data(df)
+                return df
             else:
                 st.warning("Request successful, but received empty or invalid JSON data. Check the format below.")
                 st.code(response.text, language='json')
@@ -81,122 +174,112 @@ def make_search_request(search_query: str):
         st.warning("Please ensure your n8n webhook is running at the specified URL.")
         return None
 
-def send_batch_update_requests(df: pd.DataFrame, source_key: str):
+def _send_in_chunks(action: str, cols: dict, n: int, build_payload, id_col: str, id_label: str, noun: str) -> int:
     """
-    Sends an individual POST request for each row in the DataFrame to the update webhook.
-    Returns True if successful, False otherwise.
+    Posts rows [0, n) of the column arrays to the action's webhook in chunks of
+    BATCH_SIZE, concurrently over the shared session, with live progress.
+    Each chunk is built and serialized inside its worker, so only in-flight
+    payloads are held in memory. Returns the number of rows sent successfully.
     """
-    st.subheader(f"Sending Batch Updates for {source_key} ({len(df)} records)...")
-    
-    required_cols = ['id', 's_no', 'name']
-    if not all(col in df.columns for col in required_cols):
-        st.error(f"Cannot perform update. DataFrame is missing one of the required columns: {required_cols}")
-        return False
+    def send_chunk(start: int, stop: int) -> requests.Response:
+        return _post(action, _dumps_records(build_payload(_records_chunk(cols, start, stop))))
 
-    df_to_send = df.copy()
-    df_to_send['timestamp'] = df_to_send['timestamp'].apply(
-        lambda x: x.isoformat(timespec='milliseconds').replace('+00:00', 'Z') if pd.notna(x) else None
-    )
-    
-    records = df_to_send.to_dict('records')
     progress_bar = st.progress(0)
     status_text = st.empty()
     success_count = 0
     
-    for index, record in enumerate(records):
-        s_no = record.get('s_no', index + 1)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+        futures = {}
+        for start in range(0, n, BATCH_SIZE):
+            stop = min(start + BATCH_SIZE, n)
+            futures[ex.submit(send_chunk, start, stop)] = (start, stop)
         
-        payload = {
-            "action": "update task",
-            **record
-        }
-        
-        status_text.text(f"Updating record {index + 1}/{len(records)}: S.No {s_no} - {record.get('name', 'No Name')}")
-        
-        try:
-            response = requests.post(
-                UPDATE_WEBHOOK_URL,
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=UPDATE_TIMEOUT
-            )
+        done = 0
+        for future in as_completed(futures):
+            start, stop = futures[future]
+            size = stop - start
+            batch = f"{id_label} {cols[id_col][start]}-{cols[id_col][stop - 1]} ({size} {noun})"
             
-            if response.status_code == 200:
-                success_count += 1
-            else:
-                st.error(f"Failed to update S.No {s_no} ({record.get('name', 'No Name')}): Status {response.status_code}. Response: {response.text}")
+            try:
+                response = future.result()
+                
+                if response.status_code == 200:
+                    success_count += size
+                else:
+                    st.error(f"Failed to send {batch}: Status {response.status_code}. Response: {response.text}")
 
-        except requests.exceptions.RequestException as e:
-            st.error(f"Failed to send request for S.No {s_no} ({record.get('name', 'No Name')}): {e}")
+            except requests.exceptions.RequestException as e:
+                st.error(f"Failed to send request for {batch}: {e}")
 
-        progress_bar.progress((index + 1) / len(records))
+            done += size
+            status_text.text(f"Sent {done}/{n} {noun} (last batch: {batch})")
+            progress_bar.progress(done / n)
 
     progress_bar.empty()
     status_text.empty()
+    return success_count
+
+def send_batch_update_requests(df: pd.DataFrame, source_key: str):
+    """
+    Sends the DataFrame rows to the update webhook in chunks of BATCH_SIZE records
+    per POST, running the requests concurrently over the shared session.
+    Returns True if successful, False otherwise.
+    """
+    st.subheader(f"Sending Batch Updates for {source_key} ({len(df)} records)...")
+    
+    required_cols = ['id', 's_no', 'name']
+    missing = set(required_cols).difference(df.columns)
+    if missing:
+        st.error(f"Cannot perform update. Missing columns: {sorted(missing)}")
+        return False
+
+    cols = {c: df[c].to_numpy() for c in df.columns}
+    if 'timestamp' in cols:
+        ts = pd.to_datetime(df['timestamp'], utc=True, errors='coerce')
+        ts_iso = (ts.dt.strftime('%Y-%m-%dT%H:%M:%S.%f').str.slice(0, -3) + 'Z').where(ts.notna(), None)
+        cols['timestamp'] = ts_iso.to_numpy()
+    n = len(df)
+    
+    success_count = _send_in_chunks(
+        "update", cols, n,
+        lambda chunk: {"action": "update task batch", "records": chunk},
+        id_col='s_no', id_label="S.No", noun="records"
+    )
     
-    if success_count == len(records):
+    if success_count == n:
         st.success(f"✅ Batch Update COMPLETE! All {success_count} records were saved successfully.")
         return True
     else:
-        st.warning(f"⚠️ Batch Update finished with {success_count} successful updates and {len(records) - success_count} failures. Please check error messages above.")
+        st.warning(f"⚠️ Batch Update finished with {success_count} successful updates and {n - success_count} failures. Please check error messages above.")
         return False
 
 def send_email_batch_requests(df_emails: pd.DataFrame, source_key: str):
     """
-    Sends an individual POST request for each email row to the email management webhook.
+    Sends the email rows to the email management webhook in chunks of BATCH_SIZE
+    emails per POST, running the requests concurrently over the shared session.
     """
     st.subheader(f"Sending {len(df_emails)} Emails (Batch Send)...")
     
     required_cols = ['email_id', 'recipient_email', 'subject', 'body']
-    if not all(col in df_emails.columns for col in required_cols):
-        st.error(f"Cannot send emails. DataFrame is missing one of the required columns: {required_cols}")
+    missing = set(required_cols).difference(df_emails.columns)
+    if missing:
+        st.error(f"Cannot send emails. Missing columns: {sorted(missing)}")
         return
 
-    records = df_emails.to_dict('records')
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    success_count = 0
+    # Each email must match the exact dummy format
+    cols = {c: df_emails[c].to_numpy() for c in required_cols}
+    n = len(df_emails)
     
-    for index, record in enumerate(records):
-        email_id = record.get('email_id', index + 1)
-        recipient = record.get('recipient_email', 'No Recipient')
-        
-        # Payload must match the exact dummy format
-        payload = {
-            "email_id": record.get('email_id'),
-            "recipient_email": record.get('recipient_email'),
-            "subject": record.get('subject'),
-            "body": record.get('body')
-        }
-        
-        status_text.text(f"Sending email {index + 1}/{len(records)}: ID {email_id} to {recipient}")
-        
-        try:
-            # Send the POST request to the final send webhook
-            response = requests.post(
-                EMAIL_SEND_WEBHOOK_URL,
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=UPDATE_TIMEOUT
-            )
-            
-            if response.status_code == 200:
-                success_count += 1
-            else:
-                st.error(f"Failed to send email {email_id}: Status {response.status_code}. Response: {response.text}")
-
-        except requests.exceptions.RequestException as e:
-            st.error(f"Failed to send request for email {email_id}: {e}")
-
-        progress_bar.progress((index + 1) / len(records))
-
-    progress_bar.empty()
-    status_text.empty()
+    success_count = _send_in_chunks(
+        "send", cols, n,
+        lambda chunk: {"emails": chunk},
+        id_col='email_id', id_label="email ID", noun="emails"
+    )
     
-    if success_count == len(records):
+    if success_count == n:
         st.success(f"🎉 Email Batch Send COMPLETE! Successfully sent all {success_count} emails.")
     else:
-        st.warning(f"⚠️ Email Batch Send finished with {success_count} successful sends and {len(records) - success_count} failures. Check error messages above.")
+        st.warning(f"⚠️ Email Batch Send finished with {success_count} successful sends and {n - success_count} failures. Check error messages above.")
 
 
 # --- UI Functions ---
@@ -227,17 +310,12 @@ def email_composer_ui(source_key):
         
         with st.spinner("Generating and previewing emails..."):
             try:
-                response = requests.post(
-                    EMAIL_WEBHOOK_URL,
-                    json=payload,
-                    headers={"Content-Type": "application/json"},
-                    timeout=UPDATE_TIMEOUT
-                )
+                response = _post("write", orjson.dumps(payload))
                 
                 if response.status_code == 200:
-                    data = json.loads(response.text)
+                    data = orjson.loads(response.content)
                     if data and isinstance(data, list):
-                        df = pd.DataFrame(data)
+                        df = _records_to_df(data)
                         
                         # --- FIX: Rename 'recipient' to 'recipient_email' ---
                         if 'recipient' in df.columns and 'recipient_email' not in df.columns:
@@ -287,7 +365,7 @@ def email_composer_ui(source_key):
 
         with col_send:
             if st.button("✉️ Send All Emails (Batch Send)", key=f"send_button_{source_key}", use_container_width=True, type="primary"):
-                if st.session_state[edited_email_data_key] is not None and not st.session_state[edited_email_data_key].empty:
+                if st.session_state[edited_email_data_key] is not None and len(st.session_state[edited_email_data_key]) > 0:
                     send_email_batch_requests(st.session_state[edited_email_data_key], source_key)
                 else:
                     st.warning("No emails to send.")
@@ -385,7 +463,7 @@ def webhook_search_tab():
         
         with col_save:
             if st.button("✅ Save All Changes (Batch Update)", key="save_button_tab1_update", use_container_width=True, type="primary"):
-                if st.session_state.edited_data is not None and not st.session_state.edited_data.empty:
+                if st.session_state.edited_data is not None and len(st.session_state.edited_data) > 0:
                     if send_batch_update_requests(st.session_state.edited_data, "Webhook Search"):
                         st.session_state.current_view_tab1 = "email_composer"
                         st.rerun()
@@ -393,11 +471,8 @@ def webhook_search_tab():
                     st.warning("No data to save. Please perform a search first.")
         
         # Download buttons
-        csv_data = st.session_state.edited_data.to_csv(index=False).encode('utf-8') if st.session_state.edited_data is not None else b''
-        json_buffer = io.StringIO()
-        if st.session_state.edited_data is not None:
-            st.session_state.edited_data.to_json(json_buffer, orient='records', date_format='iso', indent=4)
-        json_data = json_buffer.getvalue().encode('utf-8') if st.session_state.edited_data is not None else b''
+        csv_data = _encode_df(st.session_state.edited_data, 'csv') if st.session_state.edited_data is not None else b''
+        json_data = _encode_df(st.session_state.edited_data, 'json') if st.session_state.edited_data is not None else b''
 
         with col_download_csv:
             st.download_button(label="💾 Download CSV", data=csv_data, file_name=f"{st.session_state.last_query.replace(' ', '_')}_edited.csv", mime="text/csv", use_container_width=True, disabled=st.session_state.edited_data is None)
@@ -425,19 +500,18 @@ def json_tester_tab():
     if st.button("Generate Table from JSON", key="generate_button_tab2"):
         if json_input:
             try:
-                data = json.loads(json_input)
-                if isinstance(data, list) and len(data) > 0:
-                    df = pd.DataFrame(data)
-                    st.session_state.test_df = preprocess_data(df)
+                df = _parse_and_preprocess(json_input.encode('utf-8'))
+                if df is not None:
+                    st.session_state.test_df = df
                     st.session_state.edited_data_test = None
                     st.success(f"Successfully loaded {len(df)} records.")
-                elif isinstance(data, dict):
+                elif json_input.lstrip().startswith('{'):
                     st.error("Error: The JSON appears to be a single object. Please paste a JSON array (starts with '[').")
                     st.session_state.test_df = None
                 else:
                     st.warning("JSON list is empty. Please paste valid data.")
                     st.session_state.test_df = None
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 st.error("Error: Invalid JSON format. Please check for syntax errors.")
                 st.session_state.test_df = None
             except Exception as e:
@@ -474,7 +548,7 @@ def json_tester_tab():
 
         with col_save:
             if st.button("✅ Save All Changes (Batch Update)", key="save_button_tab2_update", use_container_width=True, type="primary"):
-                if st.session_state.edited_data_test is not None and not st.session_state.edited_data_test.empty:
+                if st.session_state.edited_data_test is not None and len(st.session_state.edited_data_test) > 0:
                     if send_batch_update_requests(st.session_state.edited_data_test, "JSON Tester"):
                         st.session_state.current_view_tab2 = "email_composer"
                         st.rerun()
@@ -482,11 +556,8 @@ def json_tester_tab():
                     st.warning("No data to save. Please load JSON data first.")
 
         # Download buttons
-        csv_data_test = st.session_state.edited_data_test.to_csv(index=False).encode('utf-8') if st.session_state.edited_data_test is not None else b''
-        json_buffer_test = io.StringIO()
-        if st.session_state.edited_data_test is not None:
-            st.session_state.edited_data_test.to_json(json_buffer_test, orient='records', date_format='iso', indent=4)
-        json_data_test = json_buffer_test.getvalue().encode('utf-8') if st.session_state.edited_data_test is not None else b''
+        csv_data_test = _encode_df(st.session_state.edited_data_test, 'csv') if st.session_state.edited_data_test is not None else b''
+        json_data_test = _encode_df(st.session_state.edited_data_test, 'json') if st.session_state.edited_data_test is not None else b''
 
         with col_download_csv:
             st.download_button(label="💾 Download CSV", data=csv_data_test, file_name="json_tester_edited.csv", mime="text/csv", use_container_width=True, disabled=st.session_state.edited_data_test is None)
@@ -1,27 +1,7 @@
 import streamlit as st
 import pandas as pd
 import json
-
-# --- Utility Functions ---
-
-def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Converts necessary columns (like 'timestamp') to their correct data types 
-    for compatibility with st.data_editor.
-    """
-    # 1. Convert 'timestamp' string to proper datetime object
-    if 'timestamp' in df.columns and df['timestamp'].dtype == object:
-        try:
-            # The 'Z' at the end indicates UTC time. pandas handles this with utc=True.
-            df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce', utc=True)
-        except Exception as e:
-            st.warning(f"Could not convert 'timestamp' column to datetime. Error: {e}")
-    
-    # 2. Fill None values in 'emails' for cleaner display
-    if 'emails' in df.columns:
-        df['emails'] = df['emails'].fillna('')
-
-    return df
+from utils import preprocess_data
 
 # --- Streamlit UI ---
 
@@ -0,0 +1,23 @@
+import streamlit as st
+import pandas as pd
+
+# --- Shared Utility Functions (used by app.py and test.py) ---
+
+def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts necessary columns (like 'timestamp') to their correct data types 
+    for compatibility with st.data_editor and fills None values.
+    """
+    # 1. Convert 'timestamp' string to proper datetime object
+    if 'timestamp' in df.columns:
+        try:
+            # The 'Z' at the end indicates UTC time. pandas handles this with utc=True.
+            df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True, errors='coerce', format='ISO8601', cache=True)
+        except Exception as e:
+            st.warning(f"Could not convert 'timestamp' column to datetime. Error: {e}")
+    
+    # 2. Fill None values in 'emails' for cleaner display
+    if 'emails' in df.columns:
+        df['emails'] = df['emails'].fillna('').astype('string')
+
+    return df